@@ -1,13 +1,39 @@
-from typing import Optional
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+from urllib.request import getproxies
+import asyncio
+import functools
+import ipaddress
 import time
 import ssl
-from requests import Response, Session
-from requests.adapters import HTTPAdapter, Retry
-from requests.cookies import RequestsCookieJar
-from .utils import deep_merge
+import orjson
+from httpx import (
+    AsyncBaseTransport,
+    AsyncClient,
+    AsyncHTTPTransport,
+    Limits,
+    Request,
+    Response,
+)
 
 
-class SSLCiphers(HTTPAdapter):
+@functools.lru_cache(maxsize=16)
+def _build_ctx(cipher_list: str, security_level: int) -> ssl.SSLContext:
+    """
+    Builds the SSLContext for the given cipher list and security level,
+    shared by every transport asking for the same pair
+    """
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = (
+        False  # For some reason this is needed to avoid a verification error
+    )
+    ctx.set_ciphers(f"{cipher_list}:@SECLEVEL={security_level}")
+    # keep TLS session tickets enabled for the long-lived shared contexts
+    ctx.options &= ~ssl.OP_NO_TICKET
+    return ctx
+
+
+class SSLCiphers(AsyncHTTPTransport):
     def __init__(
         self,
         cipher_list: Optional[str] = None,
@@ -15,6 +41,13 @@ class SSLCiphers(HTTPAdapter):
         *args,
         **kwargs,
     ):
+        cipher_list = self._validate(cipher_list, security_level)
+        self._ssl_context = _build_ctx(cipher_list, security_level)
+        super().__init__(*args, verify=self._ssl_context, **kwargs)
+
+    @staticmethod
+    def _validate(cipher_list: Optional[str], security_level: int) -> str:
+        """Validates the arguments, returns the normalised cipher list"""
         if cipher_list:
             if not isinstance(cipher_list, str):
                 raise TypeError(
@@ -28,7 +61,7 @@ class SSLCiphers(HTTPAdapter):
             raise TypeError(
                 f"Expected security_level to be an int, not {security_level!r}"
             )
-        if security_level not in range(6):
+        if not 0 <= security_level <= 5:
             raise ValueError(
                 f"The security_level must be a value between 0 and 5, not {security_level}"
             )
@@ -36,25 +69,194 @@ class SSLCiphers(HTTPAdapter):
         if not cipher_list:
             # cpython's default cipher list differs to Python-requests cipher list
             cipher_list = "DEFAULT"
+        return cipher_list
+
+
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# urllib3's default plus POST, so the auth request is retried too
+_RETRY_METHODS = frozenset(
+    {"DELETE", "GET", "HEAD", "OPTIONS", "POST", "PUT", "TRACE"}
+)
+
+
+class RetryTransport(AsyncBaseTransport):
+    """
+    Wraps a transport retrying requests answered with a retryable status,
+    with urllib3's Retry exponential backoff, waiting longer if the server
+    asks so through Retry-After
+    """
+
+    BACKOFF_MAX = 120
+    RETRY_AFTER_STATUS_CODES = frozenset({413, 429, 503})
+
+    def __init__(
+        self,
+        transport: AsyncBaseTransport,
+        total: int = 15,
+        backoff_factor: float = 0.2,
+        status_forcelist: frozenset[int] = _RETRY_STATUSES,
+        allowed_methods: frozenset[str] = _RETRY_METHODS,
+    ) -> None:
+        self.transport = transport
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = status_forcelist
+        self.allowed_methods = allowed_methods
+
+    def get_backoff_time(self, retry: int) -> float:
+        # like urllib3, the first retry goes out immediately
+        if retry <= 1:
+            return 0
+        return min(self.BACKOFF_MAX, self.backoff_factor * (2 ** (retry - 1)))
+
+    def get_retry_after(self, response: Response) -> float | None:
+        """Returns the seconds asked by the Retry-After header, if any"""
+        if response.status_code not in self.RETRY_AFTER_STATUS_CODES:
+            return None
+        retry_after = response.headers.get("Retry-After")
+        if not retry_after:
+            return None
+
+        retry_after = retry_after.strip()
+        if retry_after.isdigit():
+            return float(retry_after)
+        try:
+            retry_date = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        if retry_date.tzinfo is None:
+            return None
+        return max(0, retry_date.timestamp() - time.time())
+
+    async def handle_async_request(self, request: Request) -> Response:
+        retry = 0
+        while True:
+            response = await self.transport.handle_async_request(request)
+            if (
+                retry >= self.total
+                or request.method not in self.allowed_methods
+                or response.status_code not in self.status_forcelist
+            ):
+                return response
+
+            await response.aclose()
+            retry += 1
+            await asyncio.sleep(
+                max(self.get_backoff_time(retry), self.get_retry_after(response) or 0)
+            )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def _build_transport(
+    proxy: Optional[str] = None, max_connections: int = 100
+) -> RetryTransport:
+    return RetryTransport(
+        SSLCiphers(
+            security_level=2,
+            http2=True,
+            limits=Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=20,
+                keepalive_expiry=60,
+            ),
+            retries=3,
+            proxy=proxy,
+        )
+    )
+
+
+def _environment_https_proxy() -> tuple[str | None, list[str]]:
+    """
+    Returns the https proxy set in the environment (HTTPS_PROXY or ALL_PROXY)
+    and the url patterns of the NO_PROXY hosts, written as httpx writes them
+    """
+    env_proxies = getproxies()
+    proxy = env_proxies.get("https") or env_proxies.get("all")
+    if proxy and "://" not in proxy:
+        proxy = f"http://{proxy}"
+
+    bypass = []
+    for host in env_proxies.get("no", "").split(","):
+        host = host.strip()
+        if host == "*":
+            return None, []
+        elif not host:
+            continue
+        elif "://" in host:
+            if host.startswith(("https://", "all://")):
+                bypass.append(host)
+        elif host.lower() == "localhost":
+            bypass.append(f"all://{host}")
+        else:
+            try:
+                address = ipaddress.ip_address(host.split("/")[0])
+            except ValueError:
+                bypass.append(f"all://*{host}")
+            else:
+                bypass.append(
+                    f"all://[{host}]" if address.version == 6 else f"all://{host}"
+                )
+    return proxy, bypass
 
-        cipher_list += f":@SECLEVEL={security_level}"
 
-        ctx = ssl.create_default_context()
-        ctx.check_hostname = (
-            False  # For some reason this is needed to avoid a verification error
+def _https_mounts(
+    proxy: Optional[str], get_transport: Callable[[str | None], AsyncBaseTransport]
+) -> dict[str, AsyncBaseTransport]:
+    """
+    Builds the https mounts for the given proxy or, without one, for the
+    environment proxies: the explicit https mount would otherwise hide them
+    from httpx, which also mounts its plain transport on the NO_PROXY hosts
+    """
+    if proxy:
+        return {"https://": get_transport(proxy)}
+
+    env_proxy, bypass = _environment_https_proxy()
+    mounts = {"https://": get_transport(env_proxy)}
+    if bypass:
+        direct = mounts["https://"] if env_proxy is None else get_transport(None)
+        mounts.update(dict.fromkeys(bypass, direct))
+    return mounts
+
+
+_shared_transports: dict[str | None, RetryTransport] = {}
+
+
+def get_shared_transport(proxy: Optional[str] = None) -> RetryTransport:
+    """
+    Returns the process-wide https transport for the given proxy, letting
+    clients share connections to the same hosts.
+    proxy=None means a direct connection: environment proxies are resolved
+    by Client(shared_transport=True), which picks the transports to share.
+    Bound to one event loop: close it with close_shared_transports()
+    """
+    transport = _shared_transports.get(proxy)
+    if transport is None:
+        transport = _shared_transports[proxy] = _build_transport(
+            proxy, max_connections=200
         )
-        ctx.set_ciphers(cipher_list)
+    return transport
+
+
+async def close_shared_transports() -> None:
+    """Closes every transport returned by get_shared_transport"""
+    while _shared_transports:
+        _, transport = _shared_transports.popitem()
+        await transport.aclose()
 
-        self._ssl_context = ctx
-        super().__init__(*args, **kwargs)
 
-    def init_poolmanager(self, *args, **kwargs):
-        kwargs["ssl_context"] = self._ssl_context
-        return super().init_poolmanager(*args, **kwargs)
+class _BorrowedTransport(AsyncBaseTransport):
+    """Forwards to a transport owned by someone else, without closing it"""
 
-    def proxy_manager_for(self, *args, **kwargs):
-        kwargs["ssl_context"] = self._ssl_context
-        return super().proxy_manager_for(*args, **kwargs)
+    def __init__(self, transport: AsyncBaseTransport) -> None:
+        self.transport = transport
+
+    async def handle_async_request(self, request: Request) -> Response:
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pass
 
 
 class Auth:
@@ -63,19 +265,23 @@ class Auth:
     headers: dict[str, str] | None = None
     payload: dict[str, str] | None = None
     token: str | None = None
-    expiry: str | None = None
+    expiry: float | None = None
     token_type: str | None = None
     country: str | None = None
+    _auth_header: str | None = None
+    # seconds before the server-side expiry at which the token is refreshed
+    expiry_margin: int = 30
 
     def __init__(self, base_api, endpoint, headers, payload) -> None:
         self.base_api = base_api
         self.endpoint = endpoint
         self.headers = headers
         self.payload = payload
+        self._refresh_lock = asyncio.Lock()
 
     async def auth(
         self,
-        session: Session,
+        session: AsyncClient,
         headers: Optional[dict[str, str]] = None,
         payload: Optional[dict[str, str]] = None,
     ):
@@ -84,29 +290,54 @@ class Auth:
         elif not self.endpoint:
             raise Exception("Missing auth endpoint")
 
-        response = session.post(
+        # a stale token must not ride along on the auth request itself,
+        # unlike an Authorization the session was created with
+        if (
+            self._auth_header
+            and session.headers.get("Authorization") == self._auth_header
+        ):
+            session.headers.pop("Authorization")
+        response = await session.post(
             self.base_api + self.endpoint,
             headers=headers if headers else self.headers,
             data=payload if payload else self.payload,
-        ).json()
+        )
+        response = orjson.loads(response.content)
 
         if "error" in response:
             raise Exception("An error occurred during auth", response)
 
         self.token = response["access_token"]
-        self.expiry = time.time() + response["expires_in"]
+        expires_in = response["expires_in"]
+        # never let the margin eat more than half of a short-lived token
+        self.expiry = time.monotonic() + max(
+            0, expires_in - min(self.expiry_margin, expires_in / 2)
+        )
         self.token_type = response["token_type"]
         self.country = response["country"]
+        self._auth_header = f"{self.token_type} {self.token}"
 
         return response
 
+    async def refresh(
+        self,
+        session: AsyncClient,
+        headers: Optional[dict[str, str]] = None,
+        payload: Optional[dict[str, str]] = None,
+    ) -> None:
+        """Runs auth once for every caller, across clients, seeing the token expired"""
+        async with self._refresh_lock:
+            # another caller may have refreshed it while waiting
+            if self.is_token_expired():
+                await self.auth(session, headers, payload)
+
     def is_token_expired(self) -> bool:
-        if not self.token or not self.expiry:
+        if not self.token or self.expiry is None:
             return True
-        return not self.expiry > time.time()
+        return time.monotonic() >= self.expiry
 
     def get_auth(self) -> str:
-        return f"{self.token_type} {self.token}"
+        return self._auth_header
 
 
 class Client:
@@ -119,34 +350,50 @@ class Client:
         base_api: str,
         default_headers: dict[str, str],
         proxy: Optional[str] = None,
+        shared_transport: bool = False,
     ) -> None:
+        """
+        Params:
+            - shared_transport (bool): use the process-wide https transports of
+              get_shared_transport instead of private ones.
+              They are not closed with the client
+        """
+        if not base_api:
+            raise ValueError("Missing url base api")
         self.base_api = base_api
         self.auth = auth
-        self.__setup_session(default_headers, proxy)
-
-    def __setup_session(self, headers: dict[str, str], proxy: Optional[str]) -> None:
-        self.session = Session()
-        self.session.cookies = RequestsCookieJar()
-
-        self.session.mount(
-            "https://",
-            SSLCiphers(
-                security_level=2,
-                max_retries=Retry(
-                    total=15,
-                    backoff_factor=0.2,
-                    status_forcelist=[429, 500, 502, 503, 504],
-                ),
-            ),
+        self.__setup_session(default_headers, proxy, shared_transport)
+
+    def __setup_session(
+        self,
+        headers: dict[str, str],
+        proxy: Optional[str],
+        shared_transport: bool,
+    ) -> None:
+        if shared_transport:
+            mounts = _https_mounts(
+                proxy, lambda p: _BorrowedTransport(get_shared_transport(p))
+            )
+        else:
+            mounts = _https_mounts(proxy, _build_transport)
+
+        self.session = AsyncClient(
+            base_url=self.base_api,
+            headers=headers,
+            proxy=proxy,
+            mounts=mounts,
         )
+        # sent with the auth requests, the token replaces it for the others
+        self._default_authorization = self.session.headers.get("Authorization")
+
+    async def close(self) -> None:
+        await self.session.aclose()
 
-        if proxy:
-            self.session.proxies = {
-                "http": proxy,
-                "https": proxy,
-            }
+    async def __aenter__(self) -> "Client":
+        return self
 
-        self.session.headers.update(headers)
+    async def __aexit__(self, *args) -> None:
+        await self.close()
 
     async def request(
         self,
@@ -156,25 +403,26 @@ class Client:
         payload: Optional[dict] = None,
         params: Optional[dict] = None,
     ) -> Response:
-        if not self.base_api:
-            raise Exception("Missing url base api")
-        elif not endpoint:
+        if not endpoint:
             raise Exception("Missing endpoint")
 
         if self.auth:
             if self.auth.is_token_expired():
-                await self.auth.auth(self.session)
-            headers = deep_merge({"Authorization": self.auth.get_auth()}, headers)
+                if self._default_authorization is None:
+                    self.session.headers.pop("Authorization", None)
+                else:
+                    self.session.headers["Authorization"] = (
+                        self._default_authorization
+                    )
+                await self.auth.refresh(self.session)
+            # the Auth may have been refreshed through another client's session
+            auth_header = self.auth.get_auth()
+            if self.session.headers.get("Authorization") != auth_header:
+                self.session.headers["Authorization"] = auth_header
 
-        if method == "post":
-            return self.session.post(
-                self.base_api + endpoint, headers=headers, data=payload, params=params
-            )
-        elif method == "get":
-            return self.session.get(
-                self.base_api + endpoint, headers=headers, data=payload, params=params
-            )
-        return None
+        return await self.session.request(
+            method.upper(), endpoint, headers=headers, data=payload, params=params
+        )
 
     async def get(
         self,
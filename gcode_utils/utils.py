@@ -1,24 +1,41 @@
 import os
 from typing import Any, Optional
 import platform
+import stat
 import subprocess
 
 
-def deep_merge(dict1: dict, dict2: dict) -> dict | None:
-    """Merge two dict deeply"""
-    if not dict1 and not dict2:
-        return None
-    if not dict1:
-        return dict2
-    if not dict2:
-        return dict1
-    merged = dict1.copy()
+def deep_merge(dict1: dict, dict2: dict, inplace: bool = False) -> dict | None:
+    """
+    Merge two dict deeply
+
+    Params:
+        - dict1 (dict): base dict
+        - dict2 (dict): dict whose values take precedence
+        - inplace (bool): merge into dict1 instead of into a copy of it
+    """
+    if inplace and dict1 is not None:
+        merged = dict1
+    else:
+        if not dict1 and not dict2:
+            return None
+        if not dict1:
+            return dict2
+        if not dict2:
+            return dict1
+        merged = {**dict1}
 
-    for key, value in dict2.items():
-        if key in merged and isinstance(merged[key], dict) and isinstance(value, dict):
-            merged[key] = deep_merge(merged[key], value)
-        else:
-            merged[key] = value
+    stack = [(merged, dict2 or {})]
+    while stack:
+        dst, src = stack.pop()
+        for key, value in src.items():
+            dst_value = dst.get(key)
+            if isinstance(dst_value, dict) and isinstance(value, dict):
+                if not inplace:
+                    dst_value = dst[key] = {**dst_value}
+                stack.append((dst_value, value))
+            else:
+                dst[key] = value
 
     return merged
 
@@ -30,14 +47,69 @@ def value_or_none(
     Returns the dict value of the specified key if is present in the given dict,
     sobstitutive value if not (default None)
     """
-    return dict[key] if key in dict else value_if_not
+    return dict.get(key, value_if_not)
+
+
+# the os can't change while running, resolve it once
+_SYSTEM = platform.system()
+
+
+def _launch_windows(
+    command: str, subprocess_path: str, close_on_stop: bool, args: list
+) -> int:
+    subprocess.Popen(
+        ["cmd", "/c" if close_on_stop else "/k", command, subprocess_path] + args,
+        creationflags=subprocess.CREATE_NEW_CONSOLE,
+    )
+    return 1
+
+
+def _launch_darwin(
+    command: str, subprocess_path: str, close_on_stop: bool, args: list
+) -> int:
+    subprocess.Popen(
+        [
+            "open",
+            "-a",
+            "Terminal",
+            command + "; bash" if close_on_stop else "",
+            subprocess_path,
+        ]
+        + args
+    )
+    return 2
+
+
+def _launch_linux(
+    command: str, subprocess_path: str, close_on_stop: bool, args: list
+) -> int:
+    if close_on_stop:
+        subprocess.Popen(
+            [
+                "x-terminal-emulator",
+                "-e",
+                f"bash -c '{command} {subprocess_path} {' '.join(args)}; exec bash'",
+            ]
+        )
+    else:
+        subprocess.Popen(["x-terminal-emulator", "-e", command, subprocess_path] + args)
+    return 3
+
+
+_LAUNCHER = {
+    "Windows": _launch_windows,
+    "Darwin": _launch_darwin,
+    "Linux": _launch_linux,
+}.get(_SYSTEM)
+# Windows has no exec permission bits, os.access(X_OK) is always true there
+_EXEC_MASK = 0 if _SYSTEM == "Windows" else stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
 
 
 def run_detached_subprocess(
     command: str,
     subprocess_path: str,
     close_on_stop: bool = False,
-    args: Optional[list] = [],
+    args: Optional[list] = None,
 ) -> int:
     """
     Runs detached subprocess
@@ -55,44 +127,14 @@ def run_detached_subprocess(
         - 2  if subprocess was successfully runned on Darwin [macOS]
         - 3  if subprocess was successfully runned on Linux
     """
-    sistema_operativo = platform.system()
-
-    if not os.path.isfile(subprocess_path):
+    try:
+        st = os.stat(subprocess_path)
+    except OSError:
         return -1
-    elif not os.access(subprocess_path, os.X_OK):
+    if not stat.S_ISREG(st.st_mode):
+        return -1
+    elif _EXEC_MASK and not st.st_mode & _EXEC_MASK:
         return -2
-    elif sistema_operativo == "Windows":
-        subprocess.Popen(
-            ["start", "cmd", "/c" if close_on_stop else "/k", command, subprocess_path]
-            + args,
-            shell=True,
-        )
-        return 1
-    elif sistema_operativo == "Darwin":  # macOS
-        subprocess.Popen(
-            [
-                "open",
-                "-a",
-                "Terminal",
-                command + "; bash" if close_on_stop else "",
-                subprocess_path,
-            ]
-            + args
-        )
-        return 2
-    elif sistema_operativo == "Linux":
-        if close_on_stop:
-            subprocess.Popen(
-                [
-                    "x-terminal-emulator",
-                    "-e",
-                    f"bash -c '{command} {subprocess_path} {' '.join(args)}; exec bash'",
-                ]
-            )
-        else:
-            subprocess.Popen(
-                ["x-terminal-emulator", "-e", command, subprocess_path] + args
-            )
-        return 3
-    else:
+    elif _LAUNCHER is None:
         return 0
+    return _LAUNCHER(command, subprocess_path, close_on_stop, args or [])
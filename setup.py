@@ -8,6 +8,7 @@ setup(
     description="Ghegghe's Python coding utils",
     packages=find_packages(),
     install_requires=[
-        "requests>=2.31.0",
+        "httpx[http2]>=0.26.0",
+        "orjson>=3.10.0",
     ],
 )